@@ -3,6 +3,7 @@ Configuration settings for Jira Review Extractor.
 Loads environment variables from .env file.
 """
 
+import hashlib
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -15,14 +16,27 @@ JIRA_EMAIL = os.getenv("JIRA_EMAIL", "")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN", "")
 JIRA_USERNAME = os.getenv("JIRA_USERNAME", "")
 
+# Include each issue's change history (the largest part of the payload)
+JIRA_FETCH_CHANGELOG = os.getenv("JIRA_FETCH_CHANGELOG", "true").lower() in ("1", "true", "yes")
+
 # Date Range
 START_DATE = os.getenv("START_DATE", "2025-01-01")
 END_DATE = os.getenv("END_DATE", "")  # Empty means "now"
 
+# Concurrency for Jira requests (keep modest to stay under Jira's rate limit)
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "5"))
+
 # Groq LLM Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL_QUICK = os.getenv("GROQ_MODEL_QUICK", "llama-3.1-8b-instant")
 GROQ_MODEL_FULL = os.getenv("GROQ_MODEL_FULL", "llama-3.3-70b-versatile")
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))  # Requests per minute allowed by Groq
+
+# Number of issues summarized per quick-model request
+ISSUE_BATCH_SIZE = int(os.getenv("ISSUE_BATCH_SIZE", "10"))
+
+# Output token limit of GROQ_MODEL_QUICK; batched requests never ask for more
+QUICK_MAX_OUTPUT_TOKENS = int(os.getenv("QUICK_MAX_OUTPUT_TOKENS", "8192"))
 
 # Output directories
 OUTPUT_DIR = Path("output")
@@ -30,5 +44,13 @@ RAW_DIR = OUTPUT_DIR / "raw"
 NORMALIZED_DIR = OUTPUT_DIR / "normalized"
 SUMMARIES_DIR = OUTPUT_DIR / "summaries"
 
+# Persistent HTTP cache for Jira responses (survives re-extraction).
+# JQL filters on currentUser(), so each account gets its own cache file.
+_jira_account_hash = hashlib.sha1(f"{JIRA_BASE_URL}|{JIRA_EMAIL}".encode("utf-8")).hexdigest()[:12]
+JIRA_CACHE_PATH = OUTPUT_DIR / f".jira_cache_{_jira_account_hash}"
+
+# Persistent cache of per-issue LLM summaries (survives re-extraction)
+LLM_CACHE_DIR = OUTPUT_DIR / ".llm_cache"
+
 # Statuses to exclude from summarization (incomplete work)
-EXCLUDED_STATUSES = ["Open", "Waiting for support", "To Do", "Backlog"]
+EXCLUDED_STATUSES = frozenset({"Open", "Waiting for support", "To Do", "Backlog"})
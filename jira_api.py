@@ -3,14 +3,19 @@ Jira API interaction functions.
 Handles fetching, normalizing, and grouping issues.
 """
 
-import requests
+import requests_cache
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-from datetime import datetime
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 from config import (
     JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN,
-    START_DATE, END_DATE
+    START_DATE, END_DATE, MAX_WORKERS, JIRA_CACHE_PATH, JIRA_FETCH_CHANGELOG
 )
 
 
@@ -27,6 +32,43 @@ def get_headers():
     }
 
 
+# Cache lifetimes: responses for date windows that have already closed rarely
+# change, while the current window must stay fresh.
+CACHE_TTL_DEFAULT = timedelta(days=7)
+CACHE_TTL_CLOSED = requests_cache.NEVER_EXPIRE
+CACHE_TTL_CURRENT = timedelta(hours=1)
+
+_session = None
+
+
+def get_session():
+    """Get the shared Jira session.
+    
+    Responses are cached on disk, connections are kept alive and pooled
+    across worker threads, and transient errors are retried with backoff.
+    """
+    global _session
+    if _session is None:
+        _session = requests_cache.CachedSession(
+            cache_name=str(JIRA_CACHE_PATH),
+            backend="sqlite",
+            expire_after=CACHE_TTL_DEFAULT,
+            # bulkfetch is a read-only POST; its body is part of the cache key
+            allowable_methods=("GET", "HEAD", "POST")
+        )
+        _session.auth = get_auth()
+        _session.headers.update(get_headers())
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+            raise_on_status=False
+        )
+        _session.mount("https://", HTTPAdapter(pool_maxsize=20, max_retries=retry))
+    return _session
+
+
 def build_jql(start_date, end_date):
     """Build JQL query to get all issues user worked on in a date range.
     
@@ -52,26 +94,103 @@ def build_jql(start_date, end_date):
     return jql
 
 
-def fetch_issues_page(jql, start_at=0, max_results=50):
-    """Fetch a page of issues from Jira using the new search/jql endpoint."""
+# Fields read by normalize_issue; requesting only these keeps payloads small
+ISSUE_FIELDS = [
+    "project", "issuetype", "summary", "status", "priority", "resolution",
+    "assignee", "reporter", "created", "updated", "labels", "components",
+    "fixVersions", "description", "comment"
+]
+
+# The changelog is the largest part of each issue; only expand it when wanted
+ISSUE_EXPAND = ["changelog"] if JIRA_FETCH_CHANGELOG else []
+
+# Text kept per description/comment; summary prompts truncate further
+DESCRIPTION_MAX_CHARS = 2000
+COMMENT_MAX_CHARS = 500
+
+# Limits imposed by the search/jql and bulkfetch endpoints
+ID_PAGE_SIZE = 5000
+BULK_FETCH_SIZE = 100
+
+
+def fetch_issue_ids(jql, expire_after=CACHE_TTL_DEFAULT):
+    """Fetch the IDs of all issues matching a JQL query.
+    
+    The search/jql endpoint only paginates sequentially via nextPageToken,
+    so this sweep requests IDs alone, which allows the largest page size.
+    """
     url = f"{JIRA_BASE_URL}/rest/api/3/search/jql"
     
-    params = {
-        "jql": jql,
-        "startAt": start_at,
-        "maxResults": max_results,
-        "expand": "changelog",
-        "fields": "*all"
+    issue_ids = []
+    next_page_token = None
+    
+    while True:
+        params = {
+            "jql": jql,
+            "maxResults": ID_PAGE_SIZE,
+            "fields": "id"
+        }
+        if next_page_token:
+            params["nextPageToken"] = next_page_token
+        
+        response = get_session().get(
+            url,
+            params=params,
+            expire_after=expire_after
+        )
+        response.raise_for_status()
+        data = response.json()
+        
+        issue_ids.extend(issue["id"] for issue in data.get("issues", []))
+        
+        next_page_token = data.get("nextPageToken")
+        if data.get("isLast") or not next_page_token:
+            break
+    
+    return issue_ids
+
+
+def fetch_issues_bulk(issue_ids, fields=ISSUE_FIELDS, expand=ISSUE_EXPAND, expire_after=CACHE_TTL_DEFAULT):
+    """Fetch details for up to BULK_FETCH_SIZE issues in one request.
+    
+    Only the given fields are returned, so payload size tracks what is
+    actually used rather than every custom field on the instance.
+    """
+    url = f"{JIRA_BASE_URL}/rest/api/3/issue/bulkfetch"
+    
+    payload = {
+        "issueIdsOrKeys": issue_ids,
+        "fields": list(fields),
+        "expand": list(expand)
     }
     
-    response = requests.get(
+    response = get_session().post(
         url,
-        headers=get_headers(),
-        auth=get_auth(),
-        params=params
+        json=payload,
+        expire_after=expire_after
     )
     response.raise_for_status()
-    return response.json()
+    return response.json().get("issues", [])
+
+
+def fetch_issues_by_ids(issue_ids, expire_after=CACHE_TTL_DEFAULT):
+    """Fetch full details for a list of issue IDs, in parallel batches.
+    
+    Issues are returned in the same order as issue_ids.
+    """
+    batches = [
+        issue_ids[i:i + BULK_FETCH_SIZE]
+        for i in range(0, len(issue_ids), BULK_FETCH_SIZE)
+    ]
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        issues_by_id = {
+            issue["id"]: issue
+            for batch_issues in executor.map(partial(fetch_issues_bulk, expire_after=expire_after), batches)
+            for issue in batch_issues
+        }
+    
+    return [issues_by_id[issue_id] for issue_id in issue_ids if issue_id in issues_by_id]
 
 
 def fetch_all_issues():
@@ -94,101 +213,150 @@ def fetch_all_issues():
         
         jql = build_jql(start_str, end_str)
         
-        # Paginate through all results for this month
-        start_at = 0
-        month_issues = []
+        # Windows that closed before yesterday can be served from cache indefinitely
+        if current_end < datetime.now() - timedelta(days=1):
+            expire_after = CACHE_TTL_CLOSED
+        else:
+            expire_after = CACHE_TTL_CURRENT
         
-        while True:
-            data = fetch_issues_page(jql, start_at=start_at)
-            issues = data.get("issues", [])
-            month_issues.extend(issues)
-            
-            if start_at + len(issues) >= data.get("total", 0):
-                break
-            start_at += len(issues)
+        # Collect IDs first, then fetch details in parallel batches
+        issue_ids = fetch_issue_ids(jql, expire_after=expire_after)
+        month_issues = fetch_issues_by_ids(issue_ids, expire_after=expire_after)
         
         print(f"found {len(month_issues)} issues")
         all_issues.extend(month_issues)
         
         current_start = current_end + relativedelta(days=1)
     
-    # Deduplicate by issue key
-    seen_keys = set()
-    unique_issues = []
-    for issue in all_issues:
-        key = issue.get("key")
-        if key not in seen_keys:
-            seen_keys.add(key)
-            unique_issues.append(issue)
+    # Deduplicate by issue key. Months are fetched oldest first, so the last
+    # occurrence is the freshest copy (older months may come from cache).
+    unique_issues = list({issue.get("key"): issue for issue in all_issues}.values())
     
     print(f"\n  Total unique issues: {len(unique_issues)}")
     return unique_issues
 
 
-def fetch_comments(issue_key):
+def fetch_comments(issue_key, expire_after=CACHE_TTL_CURRENT):
     """Fetch all comments for an issue."""
     url = f"{JIRA_BASE_URL}/rest/api/3/issue/{issue_key}/comment"
     
-    response = requests.get(
-        url,
-        headers=get_headers(),
-        auth=get_auth()
-    )
+    response = get_session().get(url, expire_after=expire_after)
     response.raise_for_status()
     return response.json().get("comments", [])
 
 
-def extract_text_from_adf(adf_content):
-    """Extract plain text from Atlassian Document Format (ADF)."""
+def batch_fetch(keys, fetch_fn, max_workers=MAX_WORKERS):
+    """Call fetch_fn for each key concurrently.
+    
+    Returns a dict mapping each key to its result, in the order of keys.
+    Keys whose fetch raised are mapped to an empty list so one failed
+    request doesn't abort the batch.
+    """
+    results = {key: [] for key in keys}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_key = {executor.submit(fetch_fn, key): key for key in keys}
+        
+        for i, future in enumerate(as_completed(future_to_key), 1):
+            key = future_to_key[future]
+            if i % 20 == 0:
+                print(f"  Progress: {i}/{len(future_to_key)}...")
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                print(f"  ⚠️  Failed to fetch {key}: {e}")
+    
+    return results
+
+
+def extract_text_from_adf(adf_content, max_chars=None):
+    """Extract plain text from Atlassian Document Format (ADF).
+    
+    Traversal stops once max_chars characters have been collected.
+    """
     if not adf_content:
         return ""
     
     if isinstance(adf_content, str):
-        return adf_content
+        return adf_content[:max_chars]
     
     text_parts = []
+    append_part = text_parts.append
+    length = 0
+    stack = deque([adf_content])
+    pop = stack.pop
+    extend = stack.extend
     
-    def traverse(node):
-        if isinstance(node, dict):
+    # Children are pushed in reverse so they are popped in document order
+    while stack:
+        node = pop()
+        node_type = type(node)
+        if node_type is dict:
             if node.get("type") == "text":
-                text_parts.append(node.get("text", ""))
-            for child in node.get("content", []):
-                traverse(child)
-        elif isinstance(node, list):
-            for item in node:
-                traverse(item)
+                text = node.get("text", "")
+                append_part(text)
+                length += len(text) + 1
+                if max_chars is not None and length > max_chars:
+                    break
+            children = node.get("content")
+            if children:
+                extend(reversed(children))
+        elif node_type is list:
+            extend(reversed(node))
     
-    traverse(adf_content)
-    return " ".join(text_parts)
+    return " ".join(text_parts)[:max_chars]
+
+
+def get_inline_comments(issue):
+    """Get the comments returned inline with an issue's fields."""
+    return (issue.get("fields", {}).get("comment") or {}).get("comments", [])
+
+
+def has_truncated_comments(issue):
+    """Check whether the inline comments are only part of the issue's thread."""
+    comment_field = issue.get("fields", {}).get("comment") or {}
+    return comment_field.get("total", 0) > len(comment_field.get("comments", []))
 
 
-def normalize_issue(issue, comments):
-    """Normalize a single issue into a clean structure."""
+def normalize_issue(issue, comments=None):
+    """Normalize a single issue into a clean structure.
+    
+    Comments are read from the issue payload unless passed explicitly
+    (e.g. a full thread refetched because the inline list was truncated).
+    """
     fields = issue.get("fields", {})
     changelog = issue.get("changelog", {})
     
-    # Extract changelog events and fix versions
-    changelog_events = []
-    fix_versions = set()
-    
-    for history in changelog.get("histories", []):
-        for item in history.get("items", []):
-            changelog_events.append({
-                "date": history.get("created", ""),
-                "author": history.get("author", {}).get("displayName", "Unknown"),
-                "field": item.get("field", ""),
-                "from": item.get("fromString", ""),
-                "to": item.get("toString", "")
-            })
-            # Collect Fix Versions from changelog
-            if item.get("field") == "Fix Version" and item.get("toString"):
-                fix_versions.add(item["toString"])
+    if comments is None:
+        comments = get_inline_comments(issue)
+    
+    # Extract changelog events
+    histories = changelog.get("histories", [])
+    changelog_events = [
+        {
+            "date": history.get("created", ""),
+            "author": history.get("author", {}).get("displayName", "Unknown"),
+            "field": item.get("field", ""),
+            "from": item.get("fromString", ""),
+            "to": item.get("toString", "")
+        }
+        for history in histories
+        for item in history.get("items", [])
+    ]
+    
+    # Fix versions come from the field; only scan the changelog when it is empty
+    fix_versions = [fv.get("name", "") for fv in fields.get("fixVersions", [])]
+    if not fix_versions:
+        fix_versions = list(dict.fromkeys(
+            event["to"] for event in changelog_events
+            if event["field"] == "Fix Version" and event["to"]
+        ))
     
     # Extract comments
     normalized_comments = []
     for comment in comments:
         body = comment.get("body", "")
-        text = extract_text_from_adf(body) if isinstance(body, dict) else body
+        text = extract_text_from_adf(body, COMMENT_MAX_CHARS) if isinstance(body, dict) else body
         normalized_comments.append({
             "author": comment.get("author", {}).get("displayName", "Unknown"),
             "date": comment.get("created", ""),
@@ -197,7 +365,9 @@ def normalize_issue(issue, comments):
     
     # Extract description
     description = fields.get("description", "")
-    description_text = extract_text_from_adf(description) if isinstance(description, dict) else (description or "")
+    description_text = extract_text_from_adf(description, DESCRIPTION_MAX_CHARS) if isinstance(description, dict) else (description or "")
+    
+    components = [c.get("name", "") for c in fields.get("components", [])]
     
     return {
         "key": issue.get("key", ""),
@@ -214,8 +384,10 @@ def normalize_issue(issue, comments):
         "created": fields.get("created", ""),
         "updated": fields.get("updated", ""),
         "labels": fields.get("labels", []),
-        "components": [c.get("name", "") for c in fields.get("components", [])],
-        "fixVersions": list(fix_versions),
+        "components": components,
+        "fixVersions": fix_versions,
+        # Same rule as get_feature_for_issue, resolved once here
+        "feature": components[0] if components else (fix_versions[0] if fix_versions else None),
         "comments": normalized_comments,
         "changelog": changelog_events
     }
@@ -231,7 +403,13 @@ def get_feature_for_issue(issue):
     1. First component (if exists)
     2. First fix version (if exists)
     3. None (will be grouped as "Other")
+    
+    Normalized issues carry this precomputed as "feature"; it is only
+    derived here for data extracted before that field existed.
     """
+    if "feature" in issue:
+        return issue["feature"]
+    
     components = issue.get("components", [])
     fix_versions = issue.get("fixVersions", [])
     
@@ -247,35 +425,29 @@ def get_feature_for_issue(issue):
     return None
 
 
+def build_stats(issues):
+    """Count issues by type and status."""
+    return {
+        "totalIssues": len(issues),
+        "issueTypes": dict(Counter(issue.get("issueType", "Other") for issue in issues)),
+        "statuses": dict(Counter(issue.get("status", "Unknown") for issue in issues))
+    }
+
+
 def group_by_feature(normalized_issues):
     """Group normalized issues by feature/product instead of Jira project."""
-    features = {}
-    
+    by_feature = defaultdict(list)
     for issue in normalized_issues:
-        feature_name = get_feature_for_issue(issue) or "Other"
-        
-        if feature_name not in features:
-            features[feature_name] = {
-                "featureName": feature_name,
-                "issues": [],
-                "stats": {
-                    "totalIssues": 0,
-                    "issueTypes": {},
-                    "statuses": {}
-                }
-            }
-        
-        features[feature_name]["issues"].append(issue)
-        
-        # Update stats
-        stats = features[feature_name]["stats"]
-        stats["totalIssues"] += 1
-        
-        issue_type = issue.get("issueType", "Other")
-        stats["issueTypes"][issue_type] = stats["issueTypes"].get(issue_type, 0) + 1
-        
-        status = issue.get("status", "Unknown")
-        stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+        by_feature[get_feature_for_issue(issue) or "Other"].append(issue)
+    
+    features = {
+        feature_name: {
+            "featureName": feature_name,
+            "issues": issues,
+            "stats": build_stats(issues)
+        }
+        for feature_name, issues in by_feature.items()
+    }
     
     # Sort features by issue count (most issues first), but keep "Other" at the end
     sorted_features = dict(sorted(
@@ -288,33 +460,16 @@ def group_by_feature(normalized_issues):
 
 def group_by_project(normalized_issues):
     """Group normalized issues by project (legacy - use group_by_feature instead)."""
-    projects = {}
+    by_project = defaultdict(list)
     for issue in normalized_issues:
-        project_key = issue.get("projectKey", "Unknown")
-        project_name = issue.get("project", "Unknown")
-        
-        if project_key not in projects:
-            projects[project_key] = {
-                "projectKey": project_key,
-                "projectName": project_name,
-                "issues": [],
-                "stats": {
-                    "totalIssues": 0,
-                    "issueTypes": {},
-                    "statuses": {}
-                }
-            }
-        
-        projects[project_key]["issues"].append(issue)
-        
-        # Update stats
-        stats = projects[project_key]["stats"]
-        stats["totalIssues"] += 1
-        
-        issue_type = issue.get("issueType", "Other")
-        stats["issueTypes"][issue_type] = stats["issueTypes"].get(issue_type, 0) + 1
-        
-        status = issue.get("status", "Unknown")
-        stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+        by_project[issue.get("projectKey", "Unknown")].append(issue)
     
-    return projects
+    return {
+        project_key: {
+            "projectKey": project_key,
+            "projectName": issues[0].get("project", "Unknown"),
+            "issues": issues,
+            "stats": build_stats(issues)
+        }
+        for project_key, issues in by_project.items()
+    }
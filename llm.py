@@ -5,22 +5,69 @@ Handles API calls with rate limiting and model fallback.
 
 import requests
 import time
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from urllib3.util.retry import Retry
 
-from config import GROQ_API_KEY, GROQ_MODEL_QUICK, GROQ_MODEL_FULL
+from config import GROQ_API_KEY, GROQ_MODEL_QUICK, GROQ_MODEL_FULL, GROQ_RPM
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter."""
+    
+    def __init__(self, rate_per_sec, capacity):
+        self.rate_per_sec = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = Lock()
+    
+    def acquire(self):
+        """Take one token, blocking only while the bucket is empty."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_sec)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_sec
+            time.sleep(wait)
+
+
+# Shared by all threads; a capacity of 1 spaces request starts evenly so the
+# limit holds over any one-minute window, while responses may still overlap.
+_groq_bucket = TokenBucket(GROQ_RPM / 60, capacity=1)
+
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Shared session so connections are kept alive across calls and threads.
+# Retries back off on 429/5xx; if they run out, the caller sees the final
+# HTTPError and can fall back to another model.
+_session = requests.Session()
+_session.headers.update({
+    "Authorization": f"Bearer {GROQ_API_KEY}",
+    "Content-Type": "application/json"
+})
+_session.mount("https://", HTTPAdapter(
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST"],
+        raise_on_status=False
+    )
+))
 
 
 def call_groq(messages, model=None, max_tokens=1024):
-    """Call Groq API with the specified model."""
+    """Call Groq API with the specified model, respecting the rate limit."""
     if not model:
         model = GROQ_MODEL_QUICK
     
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "model": model,
         "messages": messages,
@@ -28,21 +75,21 @@ def call_groq(messages, model=None, max_tokens=1024):
         "temperature": 0.3
     }
     
-    response = requests.post(url, headers=headers, json=payload)
+    _groq_bucket.acquire()
+    response = _session.post(GROQ_URL, json=payload)
     response.raise_for_status()
     
     return response.json()["choices"][0]["message"]["content"]
 
 
-def quick_summary_request(messages):
+def quick_summary_request(messages, max_tokens=512):
     """Make a quick summary request with fallback on rate limit."""
     try:
-        return call_groq(messages, model=GROQ_MODEL_QUICK, max_tokens=512)
+        return call_groq(messages, model=GROQ_MODEL_QUICK, max_tokens=max_tokens)
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 429:
             print(f"  ⚠️  Rate limited on {GROQ_MODEL_QUICK}, trying groq/compound-mini...")
-            time.sleep(1)
-            return call_groq(messages, model="groq/compound-mini", max_tokens=512)
+            return call_groq(messages, model="groq/compound-mini", max_tokens=max_tokens)
         raise
 
 
@@ -53,6 +100,5 @@ def full_summary_request(messages):
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 429:
             print(f"  ⚠️  Rate limited on {GROQ_MODEL_FULL}, trying openai/gpt-oss-120b...")
-            time.sleep(1)
             return call_groq(messages, model="openai/gpt-oss-120b", max_tokens=4096)
         raise
@@ -4,7 +4,7 @@ Supports extract, summarize, and all commands.
 """
 
 import sys
-import json
+import orjson
 from datetime import datetime
 
 from config import (
@@ -13,9 +13,10 @@ from config import (
     RAW_DIR, NORMALIZED_DIR, SUMMARIES_DIR
 )
 from jira_api import (
-    fetch_all_issues, fetch_comments, normalize_issue, group_by_feature, group_by_project
+    fetch_all_issues, fetch_comments, batch_fetch, get_inline_comments,
+    has_truncated_comments, normalize_issue, group_by_feature, group_by_project
 )
-from summarizer import run_summarization, save_json
+from summarizer import run_summarization, save_json, save_json_async, wait_for_pending_writes
 
 
 def run_extraction():
@@ -55,26 +56,23 @@ def run_extraction():
         print("⚠️  No issues found matching the query.")
         return None, None
     
-    # Save raw data
-    save_json(issues, RAW_DIR / "issues_raw.json")
-    print(f"\n💾 Saved raw issues: {RAW_DIR / 'issues_raw.json'}")
+    # Save raw data in the background; nothing reads it back during this run
+    save_json_async(issues, RAW_DIR / "issues_raw.json", indent=False)
+    print(f"\n💾 Saving raw issues: {RAW_DIR / 'issues_raw.json'}")
     
-    # Step 2: Fetch comments for each issue
-    print("\n💬 Fetching comments...")
-    all_comments = {}
-    for i, issue in enumerate(issues, 1):
-        key = issue.get("key", "")
-        if i % 20 == 0:
-            print(f"  Progress: {i}/{len(issues)}...")
-        try:
-            comments = fetch_comments(key)
-            all_comments[key] = comments
-        except Exception as e:
-            print(f"  ⚠️  Failed to fetch comments for {key}: {e}")
-            all_comments[key] = []
-    
-    save_json(all_comments, RAW_DIR / "comments_raw.json")
-    print(f"💾 Saved comments: {RAW_DIR / 'comments_raw.json'}")
+    # Step 2: Collect comments (returned inline; refetch only truncated threads)
+    print("\n💬 Collecting comments...")
+    all_comments = {issue.get("key", ""): get_inline_comments(issue) for issue in issues}
+    
+    truncated_keys = [issue.get("key", "") for issue in issues if has_truncated_comments(issue)]
+    if truncated_keys:
+        print(f"  Fetching full comment threads for {len(truncated_keys)} issues...")
+        full_comments = batch_fetch(truncated_keys, fetch_comments)
+        # Keep the partial inline comments for any thread that failed to refetch
+        all_comments.update({key: comments for key, comments in full_comments.items() if comments})
+    
+    save_json_async(all_comments, RAW_DIR / "comments_raw.json", indent=False)
+    print(f"💾 Saving comments: {RAW_DIR / 'comments_raw.json'}")
     
     # Step 3: Normalize all issues
     print("\n🔄 Normalizing issues...")
@@ -143,10 +141,8 @@ def load_extracted_data():
         return None, None
     
     print("📂 Loading extracted data...")
-    with open(issues_path, "r", encoding="utf-8") as f:
-        normalized_issues = json.load(f)
-    with open(features_path, "r", encoding="utf-8") as f:
-        features = json.load(f)
+    normalized_issues = orjson.loads(issues_path.read_bytes())
+    features = orjson.loads(features_path.read_bytes())
     
     print(f"   Loaded {len(normalized_issues)} issues across {len(features)} features")
     return normalized_issues, features
@@ -154,8 +150,14 @@ def load_extracted_data():
 
 def main():
     """Main entry point with command support."""
-    mode = sys.argv[1] if len(sys.argv) > 1 else "all"
-    
+    try:
+        run_command(sys.argv[1] if len(sys.argv) > 1 else "all")
+    finally:
+        wait_for_pending_writes()
+
+
+def run_command(mode):
+    """Run the extract, summarize, or all command."""
     if mode == "extract":
         # Extract only
         run_extraction()
@@ -3,75 +3,238 @@ LLM-powered summarization pipeline.
 Generates issue summaries, feature summaries, and final review.
 """
 
-import json
-import time
+import hashlib
+import heapq
+import orjson
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from threading import Lock
+
+from diskcache import Cache
 
 from config import (
     GROQ_API_KEY, GROQ_MODEL_QUICK, GROQ_MODEL_FULL,
-    SUMMARIES_DIR, START_DATE, END_DATE, EXCLUDED_STATUSES
+    SUMMARIES_DIR, START_DATE, END_DATE, EXCLUDED_STATUSES, ISSUE_BATCH_SIZE,
+    QUICK_MAX_OUTPUT_TOKENS, LLM_CACHE_DIR
 )
 from llm import quick_summary_request, full_summary_request
 
+# Concurrent summary requests; the shared rate limiter in llm keeps them under GROQ_RPM
+SUMMARY_WORKERS = 5
 
-def save_json(data, filepath):
-    """Save data as JSON to file."""
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+_summary_cache = None
+_summary_cache_lock = Lock()
 
+# Background writer for files nothing reads back during the same run
+_io_pool = ThreadPoolExecutor(max_workers=2)
 
-def summarize_issue(issue):
-    """Generate a brief summary of a single issue."""
-    # Build context from issue data
-    context_parts = [
-        f"Issue: {issue['key']}",
-        f"Type: {issue['issueType']}",
-        f"Summary: {issue['summary']}",
-        f"Status: {issue['status']}"
-    ]
-    
-    if issue.get("description"):
-        desc = issue["description"][:500]
-        context_parts.append(f"Description: {desc}")
+
+def get_summary_cache():
+    """Get the on-disk cache of per-issue summaries."""
+    global _summary_cache
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = Cache(str(LLM_CACHE_DIR))
+    return _summary_cache
+
+
+def summary_cache_key(issue):
+    """Build the cache key for an issue's summary.
     
-    if issue.get("comments"):
-        recent_comments = issue["comments"][-3:]
-        for c in recent_comments:
-            context_parts.append(f"Comment by {c['author']}: {c['text'][:200]}")
+    The key changes whenever the issue is updated, gains comments, has its
+    description edited, or a different quick model is configured.
+    """
+    description_hash = hashlib.blake2b(
+        issue.get("description", "").encode("utf-8"), digest_size=16
+    ).hexdigest()
+    raw_key = "|".join([
+        GROQ_MODEL_QUICK,
+        issue["key"],
+        issue.get("updated", ""),
+        str(len(issue.get("comments", []))),
+        description_hash
+    ])
+    return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+
+def save_json(data, filepath, indent=True):
+    """Save data as UTF-8 JSON to file.
     
-    context = "\n".join(context_parts)
+    Pass indent=False for machine-read files to skip pretty-printing.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    filepath.write_bytes(orjson.dumps(data, option=option))
+
+
+def _report_write_error(future):
+    """Print the error of a failed background write."""
+    if future.exception():
+        print(f"  ⚠️  Failed to write JSON file: {future.exception()}")
+
+
+def save_json_async(data, filepath, indent=True):
+    """Save data as JSON on a background thread.
     
-    prompt = f"""Summarize this Jira issue in 2-3 sentences focusing on what was accomplished.
+    The data must not be mutated until the write finishes. Call
+    wait_for_pending_writes() before exiting.
+    """
+    future = _io_pool.submit(save_json, data, filepath, indent)
+    future.add_done_callback(_report_write_error)
+    return future
+
+
+def wait_for_pending_writes():
+    """Block until every background write has finished."""
+    _io_pool.shutdown(wait=True)
+
+
+# Prompt pieces shared by every issue summary request. The system message is
+# reused as-is in each request's (immutable) messages tuple across threads.
+ISSUE_CONTEXT_TEMPLATE = "Issue: {key}\nType: {issueType}\nSummary: {summary}\nStatus: {status}"
+
+ISSUE_PROMPT_TEMPLATE = """Summarize this Jira issue in 2-3 sentences focusing on what was accomplished.
 Write in third-person (not "I"). Be specific about technical work done.
 
 {context}
 
 Summary:"""
 
-    messages = [
-        {"role": "system", "content": "You are a technical writer creating concise issue summaries for a performance review. Focus on accomplishments and impact."},
-        {"role": "user", "content": prompt}
-    ]
+BATCH_PROMPT_TEMPLATE = """Summarize each of these {count} Jira issues in 2-3 sentences focusing on what was accomplished.
+Write in third-person (not "I"). Be specific about technical work done.
+
+{issues_text}
+
+For every issue, output a line "---SUMMARY <issue key>---" followed by its summary.
+Output nothing else."""
+
+ISSUE_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a technical writer creating concise issue summaries for a performance review. Focus on accomplishments and impact."
+}
+
+
+def iter_issue_details(issue):
+    """Yield the optional description and recent-comment lines of an issue's context."""
+    if issue.get("description"):
+        yield f"Description: {issue['description'][:500]}"
+    for c in issue.get("comments", [])[-3:]:
+        yield f"Comment by {c['author']}: {c['text'][:200]}"
+
+
+def build_issue_context(issue):
+    """Build the prompt context describing a single issue."""
+    return "\n".join([ISSUE_CONTEXT_TEMPLATE.format_map(issue), *iter_issue_details(issue)])
+
+
+# Matches the "---SUMMARY KEY---" lines separating batched summaries
+SUMMARY_MARKER = re.compile(r"^---SUMMARY (\S+)---[ \t]*$", re.MULTILINE)
+
+
+def summarize_issue(issue):
+    """Generate a brief summary of a single issue, reusing a cached one if present."""
+    cache = get_summary_cache()
+    cache_key = summary_cache_key(issue)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    return quick_summary_request(messages)
+    prompt = ISSUE_PROMPT_TEMPLATE.format(context=build_issue_context(issue))
+    messages = (ISSUE_SYSTEM_MESSAGE, {"role": "user", "content": prompt})
+    
+    summary = quick_summary_request(messages)
+    cache.set(cache_key, summary, expire=None)
+    return summary
+
+
+def parse_batch_summaries(response, keys):
+    """Split a batched response into a dict of issue key to summary."""
+    # split() alternates text and captured keys: [preamble, key, text, key, text, ...]
+    parts = SUMMARY_MARKER.split(response)
+    summaries = {}
+    for key, text in zip(parts[1::2], parts[2::2]):
+        text = text.strip()
+        if key in keys and text:
+            summaries[key] = text
+    return summaries
+
+
+def summarize_issues_batch(issues):
+    """Generate brief summaries for several issues with a single request.
+    
+    Returns a dict mapping issue key to summary. Cached summaries are reused,
+    issues the batched response doesn't cover are summarized individually,
+    and any that still fail are left out of the result.
+    """
+    cache = get_summary_cache()
+    cache_keys = {issue["key"]: summary_cache_key(issue) for issue in issues}
+    
+    summaries = {}
+    for key, cache_key in cache_keys.items():
+        cached = cache.get(cache_key)
+        if cached is not None:
+            summaries[key] = cached
+    
+    issues = [issue for issue in issues if issue["key"] not in summaries]
+    if not issues:
+        return summaries
+    
+    keys = {issue["key"] for issue in issues}
+    issues_text = "\n\n".join(
+        f"---ISSUE {issue['key']}---\n{build_issue_context(issue)}"
+        for issue in issues
+    )
+    prompt = BATCH_PROMPT_TEMPLATE.format(count=len(issues), issues_text=issues_text)
+    messages = (ISSUE_SYSTEM_MESSAGE, {"role": "user", "content": prompt})
+    
+    try:
+        response = quick_summary_request(messages, max_tokens=min(200 * len(issues), QUICK_MAX_OUTPUT_TOKENS))
+        for key, summary in parse_batch_summaries(response, keys).items():
+            cache.set(cache_keys[key], summary, expire=None)
+            summaries[key] = summary
+    except Exception as e:
+        print(f"    ⚠️  Batch request failed ({e}), summarizing individually...")
+    
+    # Fall back to one request per issue the batch didn't cover
+    for issue in issues:
+        if issue["key"] in summaries:
+            continue
+        try:
+            summaries[issue["key"]] = summarize_issue(issue)
+        except Exception as e:
+            print(f"    ✗ {issue['key']} ({e})")
+    
+    return summaries
+
+
+# Words in a summary that signal complex work, with the score each group adds
+MIGRATION_TRIGGERS = frozenset({"replace", "migrate", "refactor", "architect", "integration"})
+SCOPE_TRIGGERS = frozenset({"multiple", "packages", "months", "complex", "major"})
+REDESIGN_TRIGGERS = frozenset({"revamp", "overhaul", "redesign"})
+
+SCORE_TRIGGERS = (
+    (MIGRATION_TRIGGERS, 10),
+    (SCOPE_TRIGGERS, 8),
+    (REDESIGN_TRIGGERS, 8)
+)
+
+
+def score_issue(issue):
+    """Score an issue summary by complexity signals in its text."""
+    summary_lower = issue.get('summary', '').lower()
+    # Substring checks so inflections like "migrated" or "refactoring" still count
+    return sum(
+        points for triggers, points in SCORE_TRIGGERS
+        if any(w in summary_lower for w in triggers)
+    )
 
 
 def summarize_feature(feature_name, issue_summaries):
     """Generate a feature-level summary from issue summaries."""
-    # Score issues by complexity signals in summary text
-    def score_issue(issue):
-        score = 0
-        summary_lower = issue.get('summary', '').lower()
-        if any(w in summary_lower for w in ['replace', 'migrate', 'refactor', 'architect', 'integration']):
-            score += 10
-        if any(w in summary_lower for w in ['multiple', 'packages', 'months', 'complex', 'major']):
-            score += 8
-        if any(w in summary_lower for w in ['revamp', 'overhaul', 'redesign']):
-            score += 8
-        return score
-    
-    sorted_issues = sorted(issue_summaries, key=score_issue, reverse=True)
-    top_issues = sorted_issues[:25]
+    top_issues = heapq.nlargest(25, issue_summaries, key=score_issue)
     
     issues_text = "\n".join([
         f"- {s['summary'][:120]}"
@@ -183,31 +346,40 @@ def run_summarization(normalized_issues, features):
     print("\n📝 Summarizing individual issues...")
     issue_summaries = []
     
-    for i, issue in enumerate(completed_issues, 1):
-        print(f"  [{i}/{len(completed_issues)}] {issue['key']}...", end=" ")
-        feature = get_feature_for_issue(issue) or "Other"
-        try:
-            summary = summarize_issue(issue)
+    batches = [
+        completed_issues[i:i + ISSUE_BATCH_SIZE]
+        for i in range(0, len(completed_issues), ISSUE_BATCH_SIZE)
+    ]
+    batch_summaries = [{} for _ in batches]
+    done = 0
+    
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+        future_to_index = {
+            executor.submit(summarize_issues_batch, batch): i
+            for i, batch in enumerate(batches)
+        }
+        for future in as_completed(future_to_index):
+            i = future_to_index[future]
+            batch = batches[i]
+            done += len(batch)
+            try:
+                batch_summaries[i] = future.result()
+                print(f"  [{done}/{len(completed_issues)}] {batch[0]['key']}..{batch[-1]['key']} ✓")
+            except Exception as e:
+                print(f"  [{done}/{len(completed_issues)}] {batch[0]['key']}..{batch[-1]['key']} ✗ ({e})")
+    
+    # Collect in the original issue order, regardless of completion order
+    for batch, summaries in zip(batches, batch_summaries):
+        for issue in batch:
+            summary = summaries.get(issue["key"]) or f"[Summary failed] {issue['summary']}"
             issue_summaries.append({
                 "key": issue["key"],
-                "feature": feature,
+                "feature": get_feature_for_issue(issue) or "Other",
                 "project": issue["project"],
                 "projectKey": issue["projectKey"],
                 "originalSummary": issue["summary"],
                 "summary": summary
             })
-            print("✓")
-            time.sleep(2)  # Rate limit buffer - 30 RPM = 2s between requests
-        except Exception as e:
-            print(f"✗ ({e})")
-            issue_summaries.append({
-                "key": issue["key"],
-                "feature": feature,
-                "project": issue["project"],
-                "projectKey": issue["projectKey"],
-                "originalSummary": issue["summary"],
-                "summary": f"[Summary failed] {issue['summary']}"
-            })
     
     save_json(issue_summaries, SUMMARIES_DIR / "issue_summaries.json")
     
@@ -215,8 +387,12 @@ def run_summarization(normalized_issues, features):
     print("\n📊 Summarizing by feature...")
     feature_summaries = []
     
+    by_feature = defaultdict(list)
+    for s in issue_summaries:
+        by_feature[s["feature"]].append(s)
+    
     for feature_name, feature_data in features.items():
-        feature_issues = [s for s in issue_summaries if s["feature"] == feature_name]
+        feature_issues = by_feature.get(feature_name, [])
         
         if not feature_issues:
             continue
@@ -230,7 +406,6 @@ def run_summarization(normalized_issues, features):
                 "summary": summary
             })
             print("✓")
-            time.sleep(2)
         except Exception as e:
             print(f"✗ ({e})")
     